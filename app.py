@@ -1,10 +1,21 @@
 from flask import Flask, render_template, jsonify, request
 from flask_cors import CORS
 from datetime import datetime
+import backup
+import gzip
+import hashlib
 import json
+import os
+import re
 import sqlite3
+import threading
 import win32print
 
+try:
+    import brotli  # OPCIONAL: pip install Brotli
+except ImportError:
+    brotli = None
+
 app = Flask(__name__)
 CORS(app)
 
@@ -13,6 +24,10 @@ CORS(app)
 # =========================
 PRINTER_NAME = "POS-80"  # MUDE PARA O NOME EXATO DA SUA IMPRESSORA
 DB_NAME = 'the_rua_burger.db'
+BACKUP_DIR = 'backups'
+BACKUP_INTERVAL_MINUTES = 30  # 0 DESATIVA O BACKUP AUTOMÁTICO
+BACKUP_KEEP = 48
+DEBUG = True
 
 def get_db():
     conn = sqlite3.connect(DB_NAME)
@@ -25,6 +40,8 @@ def get_db():
 def init_db():
     with app.app_context():
         db = get_db()
+        # WAL: LEITURAS (E O BACKUP ONLINE) NÃO BLOQUEIAM OS PEDIDOS
+        db.execute("PRAGMA journal_mode=WAL")
         db.executescript('''
             CREATE TABLE IF NOT EXISTS products (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -88,10 +105,133 @@ def init_db():
         except: pass
         try: db.execute('ALTER TABLE products ADD COLUMN ingredients TEXT DEFAULT "[]"')
         except: pass  # ADICIONADO: garante coluna ingredients
+
+        # VERSÃO DO CARDÁPIO: triggers incrementam a cada mudança em produtos/extras
+        db.executescript('''
+            CREATE TABLE IF NOT EXISTS catalog_version (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                version INTEGER NOT NULL DEFAULT 0
+            );
+            INSERT OR IGNORE INTO catalog_version (id, version) VALUES (1, 0);
+            CREATE TRIGGER IF NOT EXISTS catalog_products_ai AFTER INSERT ON products
+                BEGIN UPDATE catalog_version SET version = version + 1 WHERE id = 1; END;
+            CREATE TRIGGER IF NOT EXISTS catalog_products_au AFTER UPDATE ON products
+                BEGIN UPDATE catalog_version SET version = version + 1 WHERE id = 1; END;
+            CREATE TRIGGER IF NOT EXISTS catalog_products_ad AFTER DELETE ON products
+                BEGIN UPDATE catalog_version SET version = version + 1 WHERE id = 1; END;
+            CREATE TRIGGER IF NOT EXISTS catalog_extras_ai AFTER INSERT ON extras
+                BEGIN UPDATE catalog_version SET version = version + 1 WHERE id = 1; END;
+            CREATE TRIGGER IF NOT EXISTS catalog_extras_au AFTER UPDATE ON extras
+                BEGIN UPDATE catalog_version SET version = version + 1 WHERE id = 1; END;
+            CREATE TRIGGER IF NOT EXISTS catalog_extras_ad AFTER DELETE ON extras
+                BEGIN UPDATE catalog_version SET version = version + 1 WHERE id = 1; END;
+        ''')
+
+        # BUSCA FULL-TEXT (FTS5) POR NOME, CATEGORIA E INGREDIENTES
+        # ingredients é JSON com escapes ("P\u00e3o"): indexa o texto decodificado via json_each
+        global HAS_FTS
+        ingredients_text = lambda col: f'''(CASE WHEN json_valid({col})
+            THEN (SELECT group_concat(value, ' ') FROM json_each({col})) ELSE {col} END)'''
+        try:
+            exists = db.execute("SELECT 1 FROM sqlite_master WHERE name = 'products_fts'").fetchone()
+            db.executescript(f'''
+                CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+                    name, category, ingredients,
+                    tokenize='unicode61 remove_diacritics 2'
+                );
+                CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+                    INSERT INTO products_fts (rowid, name, category, ingredients)
+                    VALUES (new.id, new.name, new.category, {ingredients_text('new.ingredients')});
+                END;
+                CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+                    DELETE FROM products_fts WHERE rowid = old.id;
+                END;
+                CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE ON products BEGIN
+                    DELETE FROM products_fts WHERE rowid = old.id;
+                    INSERT INTO products_fts (rowid, name, category, ingredients)
+                    VALUES (new.id, new.name, new.category, {ingredients_text('new.ingredients')});
+                END;
+            ''')
+            if not exists:
+                # INDEXA PRODUTOS CADASTRADOS ANTES DO ÍNDICE EXISTIR
+                db.execute(f'''INSERT INTO products_fts (rowid, name, category, ingredients)
+                    SELECT id, name, category, {ingredients_text('ingredients')} FROM products''')
+            HAS_FTS = True
+        except sqlite3.OperationalError as e:
+            print(f"FTS5 INDISPONÍVEL, BUSCA SEM ÍNDICE: {e}")
+            HAS_FTS = False
         db.commit()
 
+HAS_FTS = False
 init_db()
 
+# =========================
+# CARDÁPIO PRÉ-CALCULADO (PDV)
+# =========================
+_menu_cache = {'version': None, 'etag': None, 'raw': None, 'gzip': None, 'br': None}
+_menu_lock = threading.Lock()
+
+def load_json_list(value):
+    try:
+        data = json.loads(value) if value else []
+    except (TypeError, ValueError):
+        return []
+    return data if isinstance(data, list) else []
+
+def decode_product(row, extras_by_id=None, extras_by_name=None):
+    product = dict(row)
+    product['options'] = load_json_list(product.get('options'))
+    product['ingredients'] = load_json_list(product.get('ingredients'))
+    extras = load_json_list(product.get('extras'))
+    if extras_by_id is not None:
+        # RESOLVE EXTRAS DO PRODUTO (id, nome ou objeto) PARA {id, name, price}
+        resolved = []
+        for e in extras:
+            if isinstance(e, dict):
+                e = e.get('id', e.get('name'))
+            extra = extras_by_id.get(e) if isinstance(e, int) else extras_by_name.get(e)
+            if extra:
+                resolved.append(extra)
+        extras = resolved
+    product['extras'] = extras
+    return product
+
+def get_catalog_version(db):
+    row = db.execute("SELECT version FROM catalog_version WHERE id = 1").fetchone()
+    return row['version'] if row else 0
+
+def build_menu(db):
+    extras = [dict(e) for e in db.execute("SELECT id, name, price FROM extras ORDER BY name").fetchall()]
+    extras_by_id = {e['id']: e for e in extras}
+    extras_by_name = {e['name']: e for e in extras}
+
+    categories = {}
+    for p in db.execute("SELECT * FROM products ORDER BY category, name").fetchall():
+        product = decode_product(p, extras_by_id, extras_by_name)
+        categories.setdefault(product['category'] or 'Outros', []).append(product)
+
+    return {
+        'success': True,
+        'categories': [{'name': name, 'products': items} for name, items in categories.items()],
+        'extras': extras
+    }
+
+def get_menu_payload():
+    # SÓ RECALCULA QUANDO A VERSÃO DO CARDÁPIO MUDA (vale para vários processos)
+    db = get_db()
+    version = get_catalog_version(db)
+    with _menu_lock:
+        if _menu_cache['version'] != version:
+            raw = json.dumps(build_menu(db), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            _menu_cache.update({
+                'version': version,
+                'etag': 'menu-%d-%s' % (version, hashlib.md5(raw).hexdigest()[:12]),
+                'raw': raw,
+                'gzip': gzip.compress(raw, 9),
+                'br': brotli.compress(raw) if brotli else None
+            })
+        return dict(_menu_cache)
+
 # =========================
 # FUNÇÃO: GERAR COMANDA ESC/POS
 # =========================
@@ -235,6 +375,62 @@ def get_products():
     products = db.execute("SELECT * FROM products").fetchall()
     return jsonify({'success': True, 'products': [dict(p) for p in products]})
 
+@app.route('/api/menu', methods=['GET'])
+def get_menu():
+    menu = get_menu_payload()
+    accepted = request.accept_encodings
+    # ETAG FORTE PRECISA SER DIFERENTE PARA CADA CODIFICAÇÃO
+    if menu['br'] and accepted['br']:
+        response = app.response_class(menu['br'], mimetype='application/json')
+        response.headers['Content-Encoding'] = 'br'
+        etag = menu['etag'] + '-br'
+    elif accepted['gzip']:
+        response = app.response_class(menu['gzip'], mimetype='application/json')
+        response.headers['Content-Encoding'] = 'gzip'
+        etag = menu['etag'] + '-gz'
+    else:
+        response = app.response_class(menu['raw'], mimetype='application/json')
+        etag = menu['etag']
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = 'no-cache'
+    response.set_etag(etag)
+    # RESPONDE 304 SE O TERMINAL JÁ TEM ESTA VERSÃO DO CARDÁPIO
+    return response.make_conditional(request)
+
+@app.route('/api/products/search', methods=['GET'])
+def search_products():
+    q = (request.args.get('q') or '').strip()
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), 100)
+    except ValueError:
+        limit = 20
+    terms = re.findall(r'\w+', q)
+    if not terms:
+        return jsonify({'success': True, 'products': []})
+
+    db = get_db()
+    if HAS_FTS:
+        # CADA PALAVRA VIRA PREFIXO: "bac" ENCONTRA "bacon"
+        match = ' '.join('"%s"*' % t for t in terms)
+        rows = db.execute("""
+            SELECT p.* FROM products_fts f
+            JOIN products p ON p.id = f.rowid
+            WHERE products_fts MATCH ?
+            ORDER BY bm25(products_fts, 10.0, 2.0, 1.0)
+            LIMIT ?
+        """, (match, limit)).fetchall()
+    else:
+        # SEM FTS5: MESMOS CAMPOS DO ÍNDICE, COM INGREDIENTES DECODIFICADOS ("P\u00e3o" -> "Pão")
+        terms = [t.casefold() for t in terms]
+        rows = []
+        for p in db.execute("SELECT * FROM products ORDER BY name").fetchall():
+            fields = [p['name'] or '', p['category'] or ''] + [str(i) for i in load_json_list(p['ingredients'])]
+            text = ' '.join(fields).casefold()
+            if all(t in text for t in terms):
+                rows.append(p)
+        rows = rows[:limit]
+    return jsonify({'success': True, 'products': [decode_product(r) for r in rows]})
+
 @app.route('/api/products', methods=['POST'])
 def add_product():
     data = request.json
@@ -673,5 +869,10 @@ if __name__ == '__main__':
     print("  PDV:  http://127.0.0.1:5000/pdv")
     print("  COZINHA: http://127.0.0.1:5000/kitchen")
     print("  ENTREGADOR: http://127.0.0.1:5000/delivery")
+    if BACKUP_INTERVAL_MINUTES:
+        print(f"BACKUP: a cada {BACKUP_INTERVAL_MINUTES} min em {BACKUP_DIR}/ (mantém {BACKUP_KEEP})")
     print("="*60)
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    # COM O RELOADER (DEBUG) ESTE BLOCO RODA DUAS VEZES; SÓ O PROCESSO FILHO AGENDA
+    if BACKUP_INTERVAL_MINUTES and (not DEBUG or os.environ.get('WERKZEUG_RUN_MAIN') == 'true'):
+        backup.start_scheduler(DB_NAME, BACKUP_DIR, BACKUP_INTERVAL_MINUTES, BACKUP_KEEP)
+    app.run(host='0.0.0.0', port=5000, debug=DEBUG)
\ No newline at end of file
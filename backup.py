@@ -0,0 +1,446 @@
+"""
+BACKUP ONLINE DO the_rua_burger.db (SEM PARAR O SERVIDOR)
+
+Uso:
+    python backup.py backup            # cópia online + rotação
+    python backup.py list              # lista cópias existentes
+    python backup.py verify [ARQUIVO]  # checa integridade (padrão: última cópia)
+    python backup.py restore ARQUIVO   # verifica, salva o atual e restaura
+    python backup.py bench             # mede latência de pedidos com backup rodando
+"""
+from datetime import datetime
+import argparse
+import glob
+import hashlib
+import os
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+
+# =========================
+# CONFIGURAÇÃO
+# =========================
+DB_NAME = 'the_rua_burger.db'
+BACKUP_DIR = 'backups'
+BACKUP_KEEP = 48          # QUANTAS CÓPIAS MANTER
+PRE_RESTORE_KEEP = 5      # QUANTAS CÓPIAS DE SEGURANÇA (-pre-restore) MANTER
+PRE_RESTORE_SUFFIX = '-pre-restore'
+BACKUP_PAGES = 64         # PÁGINAS POR PASSO (PEQUENO = NÃO TRAVA O create_order)
+BACKUP_SLEEP = 0.005      # PAUSA ENTRE PASSOS (SEGUNDOS)
+REQUIRED_TABLES = ('products', 'extras', 'cash_sessions', 'orders', 'order_items')
+
+
+def _backup_name(db_path, suffix=''):
+    base = os.path.splitext(os.path.basename(db_path))[0]
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+    return f"{base}-{stamp}{suffix}.db"
+
+
+def _sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def copy_online(src_path, dest_path, pages=BACKUP_PAGES, sleep=BACKUP_SLEEP):
+    """Copia src_path para dest_path com a API de backup do SQLite, em passos pequenos."""
+    src = sqlite3.connect(src_path, timeout=30, isolation_level=None)
+    dst = sqlite3.connect(dest_path)
+    state = {'remaining': None, 'restarts': 0}
+
+    def progress(status, remaining, total):
+        # COM O SNAPSHOT FIXO A CÓPIA NÃO RECOMEÇA; CONTA SÓ PARA CONFERIR NO bench
+        if state['remaining'] is not None and remaining > state['remaining']:
+            state['restarts'] += 1
+        state['remaining'] = remaining
+        # O sleep= DO PYTHON SÓ VALE PARA BUSY/LOCKED; A PAUSA ENTRE PASSOS É AQUI
+        if remaining and sleep > 0:
+            time.sleep(sleep)
+
+    try:
+        # FIXA UM SNAPSHOT DE LEITURA: TODOS OS PASSOS COPIAM A MESMA VERSÃO DO BANCO.
+        # EM WAL OS PEDIDOS CONTINUAM GRAVANDO NO -wal SEM ESPERAR;
+        # EM MODO DELETE ELES ESPERAM O FIM DA CÓPIA (TRAVA SHARED)
+        src.execute("BEGIN")
+        src.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+        try:
+            src.backup(dst, pages=pages, progress=progress, sleep=sleep)
+        finally:
+            src.execute("COMMIT")
+        # A CÓPIA HERDA O MODO WAL DO ORIGINAL; VOLTA PARA UM ARQUIVO ÚNICO, SEM -wal/-shm
+        dst.execute("PRAGMA journal_mode=DELETE")
+    finally:
+        dst.close()
+        src.close()
+    return state['restarts']
+
+
+def list_backups(db_path=DB_NAME, backup_dir=BACKUP_DIR, pre_restore=None):
+    """Lista as cópias; pre_restore=False só as normais, True só as de segurança."""
+    base = os.path.splitext(os.path.basename(db_path))[0]
+    # ORDEM DO NOME = ORDEM CRONOLÓGICA (CARIMBO AAAAMMDD-HHMMSS)
+    backups = sorted(glob.glob(os.path.join(backup_dir, f"{base}-*.db")))
+    if pre_restore is None:
+        return backups
+    return [b for b in backups if b.endswith(PRE_RESTORE_SUFFIX + '.db') == pre_restore]
+
+
+def rotate_backups(db_path=DB_NAME, backup_dir=BACKUP_DIR, keep=BACKUP_KEEP, pre_restore=False):
+    removed = []
+    backups = list_backups(db_path, backup_dir, pre_restore)
+    for old in backups[:-keep] if keep > 0 else []:
+        # CÓPIAS ANTIGAS PODEM TER -wal/-shm AO LADO
+        for path in (old, old + '-wal', old + '-shm'):
+            if os.path.exists(path):
+                os.remove(path)
+        removed.append(old)
+    return removed
+
+
+def create_backup(db_path=DB_NAME, backup_dir=BACKUP_DIR, keep=BACKUP_KEEP,
+                  pages=BACKUP_PAGES, sleep=BACKUP_SLEEP, suffix=''):
+    """Faz a cópia online, descarta se for idêntica à anterior e aplica a retenção."""
+    os.makedirs(backup_dir, exist_ok=True)
+    pre_restore = suffix == PRE_RESTORE_SUFFIX
+    previous = list_backups(db_path, backup_dir, pre_restore=False)
+    dest = os.path.join(backup_dir, _backup_name(db_path, suffix))
+    partial = dest + '.partial'
+
+    started = time.perf_counter()
+    try:
+        restarts = copy_online(db_path, partial, pages=pages, sleep=sleep)
+    except Exception:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+    elapsed = time.perf_counter() - started
+
+    # INCREMENTAL: SE NADA MUDOU DESDE A ÚLTIMA CÓPIA, NÃO GUARDA OUTRA IGUAL
+    if not suffix and previous and _sha256(partial) == _sha256(previous[-1]):
+        os.remove(partial)
+        return {'path': previous[-1], 'skipped': True, 'seconds': elapsed,
+                'restarts': restarts, 'removed': []}
+
+    os.replace(partial, dest)
+    if pre_restore:
+        removed = rotate_backups(db_path, backup_dir, PRE_RESTORE_KEEP, pre_restore=True)
+    else:
+        removed = rotate_backups(db_path, backup_dir, keep)
+    return {'path': dest, 'skipped': False, 'seconds': elapsed,
+            'restarts': restarts, 'removed': removed}
+
+
+# =========================
+# VERIFICAÇÃO E RESTAURAÇÃO
+# =========================
+def _is_rollback_file(path):
+    # BYTE 18 DO CABEÇALHO: 1 = ROLLBACK (DELETE), 2 = WAL
+    with open(path, 'rb') as f:
+        header = f.read(100)
+    return len(header) == 100 and header[18] == 1 and not os.path.exists(path + '-wal')
+
+
+def _open_readonly(path):
+    # immutable=1 NÃO CRIA -wal/-shm (FUNCIONA EM PASTA SÓ DE LEITURA), MAS IGNORA O -wal:
+    # SÓ PARA ARQUIVOS EM MODO ROLLBACK SEM -wal AO LADO (AS CÓPIAS DO create_backup)
+    flags = 'mode=ro&immutable=1' if _is_rollback_file(path) else 'mode=ro'
+    return sqlite3.connect(f"file:{os.path.abspath(path)}?{flags}", uri=True)
+
+
+def verify_backup(path):
+    """Roda as checagens de integridade num arquivo de banco, sem alterá-lo."""
+    result = {'path': path, 'ok': False, 'errors': [], 'tables': {}}
+    if not os.path.isfile(path):
+        result['errors'].append('arquivo não encontrado')
+        return result
+
+    try:
+        conn = _open_readonly(path)
+        try:
+            integrity = [r[0] for r in conn.execute("PRAGMA integrity_check").fetchall()]
+            if integrity != ['ok']:
+                result['errors'].extend(f"integrity_check: {msg}" for msg in integrity)
+
+            for r in conn.execute("PRAGMA foreign_key_check").fetchall():
+                result['errors'].append(f"foreign_key_check: {r[0]} rowid {r[1]} -> {r[2]}")
+
+            existing = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            for table in REQUIRED_TABLES:
+                if table not in existing:
+                    result['errors'].append(f"tabela ausente: {table}")
+                    continue
+                result['tables'][table] = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+            if 'products_fts' in existing:
+                indexed = conn.execute("SELECT COUNT(*) FROM products_fts").fetchone()[0]
+                if indexed != result['tables'].get('products'):
+                    result['errors'].append(f"products_fts desatualizado: {indexed} indexados")
+        finally:
+            conn.close()
+    except sqlite3.DatabaseError as e:
+        result['errors'].append(str(e))
+
+    result['ok'] = not result['errors']
+    return result
+
+
+def restore_backup(path, db_path=DB_NAME, backup_dir=BACKUP_DIR):
+    """Verifica a cópia, guarda o banco atual e restaura pela API de backup."""
+    check = verify_backup(path)
+    if not check['ok']:
+        raise ValueError(f"Cópia inválida, restauração cancelada: {'; '.join(check['errors'])}")
+
+    safety = None
+    catalog_version = 0
+    if os.path.exists(db_path):
+        safety = create_backup(db_path, backup_dir, suffix=PRE_RESTORE_SUFFIX)['path']
+        conn = _open_readonly(safety)
+        try:
+            catalog_version = conn.execute("SELECT version FROM catalog_version WHERE id = 1").fetchone()[0]
+        except (sqlite3.OperationalError, TypeError):
+            pass
+        finally:
+            conn.close()
+
+    # RESTAURA COM A API DE BACKUP: OUTRAS CONEXÕES VEEM O BANCO TODO TROCADO DE UMA VEZ
+    src = _open_readonly(path)
+    dst = sqlite3.connect(db_path, timeout=30)
+    try:
+        src.backup(dst)
+        # VERSÃO DO CARDÁPIO SEMPRE AVANÇA: PROCESSOS COM O CARDÁPIO EM CACHE RECALCULAM
+        dst.executescript('''
+            CREATE TABLE IF NOT EXISTS catalog_version (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                version INTEGER NOT NULL DEFAULT 0
+            );
+            INSERT OR IGNORE INTO catalog_version (id, version) VALUES (1, 0);
+        ''')
+        dst.execute("UPDATE catalog_version SET version = MAX(version, ?) + 1 WHERE id = 1",
+                    (catalog_version,))
+        dst.commit()
+    finally:
+        dst.close()
+        src.close()
+
+    after = verify_backup(db_path)
+    if not after['ok']:
+        raise RuntimeError(f"Banco restaurado falhou na verificação: {'; '.join(after['errors'])}")
+    return {'restored': path, 'safety_copy': safety, 'tables': after['tables']}
+
+
+# =========================
+# AGENDAMENTO
+# =========================
+def start_scheduler(db_path=DB_NAME, backup_dir=BACKUP_DIR, interval_minutes=30, keep=BACKUP_KEEP):
+    """Inicia uma thread daemon que faz backup a cada interval_minutes."""
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval_minutes * 60):
+            try:
+                info = create_backup(db_path, backup_dir, keep)
+                if not info['skipped']:
+                    print(f"BACKUP SALVO: {info['path']} ({info['seconds']:.2f}s)")
+            except Exception as e:
+                print(f"[ERRO] BACKUP AGENDADO: {e}")
+
+    thread = threading.Thread(target=run, name='backup-scheduler', daemon=True)
+    thread.start()
+    return stop
+
+
+# =========================
+# BENCHMARK: LATÊNCIA DO create_order DURANTE BACKUP
+# =========================
+def _simulate_order(conn, cash_id):
+    # MESMAS ESCRITAS DO create_order: 1 PEDIDO + ITENS, UM COMMIT
+    cursor = conn.execute("""
+        INSERT INTO orders (customer_name, type, total, status, created_at, payment_method, cash_session_id)
+        VALUES ('Bench', 'local', 44.0, 'preparing', ?, 'dinheiro', ?)
+    """, (datetime.now().isoformat(), cash_id))
+    for _ in range(3):
+        conn.execute("""
+            INSERT INTO order_items (order_id, product_id, product_name, quantity, total, extras, removed_ingredients, note)
+            VALUES (?, 1, 'Bench Burger', 1, 14.0, '[{"name": "Bacon", "price": 3.0}]', '["Cebola"]', '')
+        """, (cursor.lastrowid,))
+    conn.commit()
+
+
+def _rush(db_path, seconds, rate):
+    conn = sqlite3.connect(db_path, timeout=30)
+    cash_id = conn.execute("SELECT id FROM cash_sessions ORDER BY id DESC LIMIT 1").fetchone()[0]
+    latencies = []
+    interval = 1.0 / rate
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        _simulate_order(conn, cash_id)
+        latencies.append((time.perf_counter() - started) * 1000)
+        time.sleep(max(0.0, interval - (time.perf_counter() - started)))
+    conn.close()
+    return latencies
+
+
+def _summary(latencies):
+    ordered = sorted(latencies)
+    pct = lambda p: ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+    return {'orders': len(ordered), 'p50': statistics.median(ordered),
+            'p95': pct(0.95), 'p99': pct(0.99), 'max': ordered[-1]}
+
+
+def run_benchmark(db_path=DB_NAME, seconds=10, rate=50, seed_orders=20000,
+                  pages=BACKUP_PAGES, sleep=BACKUP_SLEEP, journal_mode='wal'):
+    """Compara a latência dos pedidos com e sem backup rodando, numa cópia do banco."""
+    workdir = tempfile.mkdtemp(prefix='rua_bench_')
+    try:
+        bench_db = os.path.join(workdir, 'bench.db')
+        if os.path.exists(db_path):
+            copy_online(db_path, bench_db, pages=-1, sleep=0)
+        conn = sqlite3.connect(bench_db)
+        conn.executescript('''
+            CREATE TABLE IF NOT EXISTS cash_sessions (id INTEGER PRIMARY KEY AUTOINCREMENT, opened_at TEXT,
+                opening_amount REAL DEFAULT 0, is_open INTEGER DEFAULT 1);
+            CREATE TABLE IF NOT EXISTS orders (id INTEGER PRIMARY KEY AUTOINCREMENT, customer_name TEXT,
+                type TEXT NOT NULL, address TEXT, phone TEXT, note TEXT, total REAL NOT NULL,
+                status TEXT DEFAULT 'preparing', created_at TEXT, payment_method TEXT DEFAULT 'dinheiro',
+                cash_session_id INTEGER);
+            CREATE TABLE IF NOT EXISTS order_items (id INTEGER PRIMARY KEY AUTOINCREMENT, order_id INTEGER,
+                product_id INTEGER, product_name TEXT NOT NULL, quantity INTEGER NOT NULL, total REAL NOT NULL,
+                extras TEXT DEFAULT '[]', removed_ingredients TEXT DEFAULT '[]', note TEXT);
+        ''')
+        journal_mode = conn.execute(f"PRAGMA journal_mode={journal_mode}").fetchone()[0]
+        conn.execute("INSERT INTO cash_sessions (opened_at, opening_amount, is_open) VALUES (?, 0, 1)",
+                     (datetime.now().isoformat(),))
+        cash_id = conn.execute("SELECT MAX(id) FROM cash_sessions").fetchone()[0]
+        # ENCORPA O BANCO PARA O BACKUP TER O QUE COPIAR
+        with conn:
+            for _ in range(seed_orders):
+                cursor = conn.execute("""INSERT INTO orders (customer_name, type, total, created_at, cash_session_id)
+                                         VALUES ('Seed', 'local', 44.0, ?, ?)""", (datetime.now().isoformat(), cash_id))
+                conn.executemany("""INSERT INTO order_items (order_id, product_name, quantity, total, extras, removed_ingredients)
+                                    VALUES (?, 'Seed Burger', 1, 14.0, '[]', '[]')""", [(cursor.lastrowid,)] * 3)
+        # EM WAL OS DADOS AINDA ESTÃO NO -wal; CHECKPOINT ANTES DE MEDIR O TAMANHO
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        conn.close()
+        size_mb = os.path.getsize(bench_db) / (1024 * 1024)
+
+        baseline = _summary(_rush(bench_db, seconds, rate))
+
+        stop = threading.Event()
+        backups = []
+
+        def backup_loop():
+            while not stop.is_set():
+                info = create_backup(bench_db, os.path.join(workdir, 'backups'), keep=2,
+                                     pages=pages, sleep=sleep)
+                backups.append(info)
+
+        worker = threading.Thread(target=backup_loop, daemon=True)
+        worker.start()
+        with_backup = _summary(_rush(bench_db, seconds, rate))
+        stop.set()
+        worker.join()
+
+        return {
+            'db_size_mb': size_mb,
+            'journal_mode': journal_mode,
+            'pages': pages,
+            'sleep': sleep,
+            'baseline': baseline,
+            'with_backup': with_backup,
+            'backups': len(backups),
+            'backup_seconds': statistics.mean(b['seconds'] for b in backups) if backups else 0.0,
+            'backup_restarts': sum(b['restarts'] for b in backups)
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+# =========================
+# LINHA DE COMANDO
+# =========================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Backup online do banco do The Rua Burguer')
+    parser.add_argument('--db', default=DB_NAME)
+    parser.add_argument('--dir', default=BACKUP_DIR)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('backup', help='faz uma cópia online e aplica a retenção')
+    p.add_argument('--keep', type=int, default=BACKUP_KEEP)
+    p.add_argument('--pages', type=int, default=BACKUP_PAGES)
+    p.add_argument('--sleep', type=float, default=BACKUP_SLEEP)
+
+    sub.add_parser('list', help='lista as cópias existentes')
+
+    p = sub.add_parser('verify', help='checa a integridade de uma cópia')
+    p.add_argument('path', nargs='?')
+
+    p = sub.add_parser('restore', help='restaura uma cópia verificada')
+    p.add_argument('path')
+
+    p = sub.add_parser('bench', help='latência de pedidos com e sem backup')
+    p.add_argument('--seconds', type=float, default=10)
+    p.add_argument('--rate', type=float, default=50, help='pedidos por segundo')
+    p.add_argument('--seed-orders', type=int, default=20000)
+    p.add_argument('--pages', type=int, default=BACKUP_PAGES)
+    p.add_argument('--sleep', type=float, default=BACKUP_SLEEP)
+    p.add_argument('--journal', default='wal', choices=['wal', 'delete'])
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'backup':
+        info = create_backup(args.db, args.dir, args.keep, args.pages, args.sleep)
+        if info['skipped']:
+            print(f"SEM ALTERAÇÕES DESDE {info['path']}, NADA A SALVAR")
+        else:
+            print(f"BACKUP SALVO: {info['path']} ({info['seconds']:.2f}s, {info['restarts']} reinícios)")
+        for old in info['removed']:
+            print(f"  REMOVIDO: {old}")
+
+    elif args.command == 'list':
+        for path in list_backups(args.db, args.dir):
+            print(f"{path}  {os.path.getsize(path) / 1024:.0f} KB")
+
+    elif args.command == 'verify':
+        backups = list_backups(args.db, args.dir, pre_restore=False)
+        path = args.path or (backups[-1] if backups else None)
+        if not path:
+            print("NENHUM BACKUP ENCONTRADO")
+            return 1
+        result = verify_backup(path)
+        print(f"{'OK' if result['ok'] else 'FALHOU'}: {path}")
+        for table, count in result['tables'].items():
+            print(f"  {table}: {count}")
+        for error in result['errors']:
+            print(f"  ERRO: {error}")
+        return 0 if result['ok'] else 1
+
+    elif args.command == 'restore':
+        try:
+            info = restore_backup(args.path, args.db, args.dir)
+        except (ValueError, RuntimeError) as e:
+            print(f"ERRO: {e}")
+            return 1
+        print(f"RESTAURADO: {info['restored']} -> {args.db}")
+        if info['safety_copy']:
+            print(f"  BANCO ANTERIOR SALVO EM: {info['safety_copy']}")
+
+    elif args.command == 'bench':
+        r = run_benchmark(args.db, args.seconds, args.rate, args.seed_orders, args.pages, args.sleep,
+                          args.journal)
+        print(f"BANCO: {r['db_size_mb']:.1f} MB | journal_mode={r['journal_mode']} | "
+              f"pages={r['pages']} sleep={r['sleep']}s")
+        for label, s in (('SEM BACKUP', r['baseline']), ('COM BACKUP', r['with_backup'])):
+            print(f"{label:<11} pedidos={s['orders']:<5} p50={s['p50']:.2f}ms p95={s['p95']:.2f}ms "
+                  f"p99={s['p99']:.2f}ms max={s['max']:.2f}ms")
+        print(f"BACKUPS: {r['backups']} | média {r['backup_seconds']:.2f}s | reinícios {r['backup_restarts']}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())